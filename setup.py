@@ -25,7 +25,7 @@ def readfile(filename):
 
 requiers = """
 jmespath
-oyaml
+pyyaml
 """.split("\n")
 
 version = readfile("VERSION")[0].strip()
@@ -0,0 +1,108 @@
+###############################################################
+# pytest -v --capture=no tests/test_commit.py
+# pytest -v  tests/test_commit.py
+# pytest -v --capture=no  tests/test_commit.py::TestCommit::<METHODNAME>
+###############################################################
+
+import os
+
+import pytest
+from yamldb.YamlDB import YamlDB
+
+from cloudmesh.common.util import HEADING
+from cloudmesh.common.systeminfo import os_is_windows
+from cloudmesh.common.util import path_expand
+
+if os_is_windows:
+    filename = "~/.cloudmesh/commit.yaml"
+else:
+    filename = "/tmp/commit.yaml"
+
+filename = path_expand(filename)
+
+
+@pytest.mark.incremental
+class TestCommit:
+
+    def test_autocommit_off(self):
+        HEADING()
+        if os.path.exists(filename):
+            os.remove(filename)
+        db = YamlDB(filename=filename, autocommit=False)
+        db["a.b"] = 1
+        assert "a" not in YamlDB(filename=filename).data
+        db.flush()
+        assert YamlDB(filename=filename)["a.b"] == 1
+
+    def test_with_block(self):
+        HEADING()
+        db = YamlDB(filename=filename)
+        with db:
+            db["c.d"] = 2
+            db.update_many({"e.f": 3, "e.g": 4})
+            assert "c" not in YamlDB(filename=filename).data
+        db = YamlDB(filename=filename)
+        assert db["c.d"] == 2
+        assert db["e.f"] == 3
+        assert db["e.g"] == 4
+
+    def test_wal(self):
+        HEADING()
+        db = YamlDB(filename=filename)
+        db["w.x"] = 5
+        db.delete("c.d")
+        assert os.path.isfile(f"{filename}.wal")
+        db = YamlDB(filename=filename)
+        assert db["w.x"] == 5
+        assert "c.d" not in db
+        db.close()
+        assert not os.path.isfile(f"{filename}.wal")
+        assert YamlDB(filename=filename)["w.x"] == 5
+
+    def test_flush(self):
+        HEADING()
+        db = YamlDB(filename=filename)
+        db.data["direct"] = 1
+        db.data["w"]["x"] = 7
+        db.flush()
+        assert not os.path.isfile(f"{filename}.wal")
+        db = YamlDB(filename=filename)
+        assert db["direct"] == 1
+        assert db["w.x"] == 7
+
+    def test_mode(self):
+        HEADING()
+        if os.name == "nt":
+            return
+        os.chmod(filename, 0o600)
+        db = YamlDB(filename=filename)
+        db["secret"] = "s"
+        assert oct(os.stat(f"{filename}.wal").st_mode & 0o777) == oct(0o600)
+        db.close()
+        assert oct(os.stat(filename).st_mode & 0o777) == oct(0o600)
+        assert not [name for name in os.listdir(os.path.dirname(filename))
+                    if name.startswith(f".{os.path.basename(filename)}.")]
+
+    def test_two_instances(self):
+        HEADING()
+        first = YamlDB(data={"x": 1}, filename=filename)
+        second = YamlDB(filename=filename)
+        second["a"] = 5
+        # first does not see a = 5, so these records no longer apply
+        first["a.b.c"] = 1
+        first.delete("a.b.c")
+        first["other"] = 2
+        db = YamlDB(filename=filename)
+        assert db["a"] == 5
+        assert db["other"] == 2
+        assert YamlDB.load_header(filename, keys=("a",)) == {"a": 5}
+
+    def test_reload_discards_pending(self):
+        HEADING()
+        db = YamlDB(data={}, filename=filename, autocommit=False)
+        db["a"] = 1
+        db.load()
+        with db:
+            db["b"] = 2
+        assert db.data == {"b": 2}
+        assert YamlDB(filename=filename).data == {"b": 2}
@@ -4,6 +4,7 @@
 # pytest -v --capture=no  tests/test_config..py::Test_config::<METHODNAME>
 ###############################################################
 
+import copy
 import os
 from pprint import pprint
 
@@ -70,6 +71,38 @@ class TestConfig:
         assert "a" in result
         assert "c.c1" in db
 
+    def test_len(self):
+        HEADING()
+        db = YamlDB(data=data, filename=filename)
+        assert len(db) == 3
+        assert db.deep_len() == 4
+        assert db.deep_len() == len(db.keys())
+
+    def test_yaml(self):
+        HEADING()
+        db = YamlDB(data=copy.deepcopy(data), filename=filename)
+        assert db.yaml() == "a: 1\nb: text\nc:\n  c1: c\n  c2: cc\n"
+        assert str(db) == db.yaml()
+        db.dict()["c"]["c1"] = "changed"
+        assert "c1: changed" in str(db)
+        db = YamlDB(data=data, filename=filename)
+
+    def test_json(self):
+        HEADING()
+        db = YamlDB(data=data, filename=filename)
+        assert db.to_json() == '{"a":1,"b":"text","c":{"c1":"c","c2":"cc"}}'
+
+    def test_contains(self):
+        HEADING()
+        db = YamlDB(data={1: "one", "c": {"c1": "c"}}, filename=filename)
+        assert 1 in db
+        assert db[1] == "one"
+        assert 2 not in db
+        assert "c.c1" in db
+        assert "c.c1.x" not in db
+        assert "c.c2" not in db
+        db = YamlDB(data=data, filename=filename)
+
     def test_set(self):
         HEADING()
         StopWatch.start("set")
@@ -61,16 +61,32 @@ class TestConfig:
         assert db["floor.key"] == "value"
 
         keys = db.keys()
-        assert len(keys) == 4
+        assert len(keys) == 3
         print (keys)
 
-        # banner("delete")
-        # StopWatch.start("delete")
-        # db.delete("floor.key")
-        # StopWatch.stop("delete")
-        # assert "floor.key" not in db
-        # banner("db.data after delete")
-        # print(db)
+        banner("delete")
+        StopWatch.start("delete")
+        db.delete("floor.key")
+        StopWatch.stop("delete")
+        assert "floor.key" not in db
+        assert "floor.key_a" in db
+        banner("db.data after delete")
+        print(db)
+
+    def test_delete_nested(self):
+        HEADING()
+        db = YamlDB(data={"a": {"b": {"c": 1, "d": 2}}}, filename=filename)
+        db.delete("a.b.c")
+        assert "a.b.c" not in db
+        assert db["a.b.d"] == 2
+
+        db = YamlDB(filename=filename)
+        assert "a.b.c" not in db
+        assert db["a.b.d"] == 2
+
+        # deleting a key that does not exist does nothing
+        db.delete("a.b.nothing")
+        assert db["a.b"] == {"d": 2}
 
 class g:
 
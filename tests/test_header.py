@@ -0,0 +1,73 @@
+###############################################################
+# pytest -v --capture=no tests/test_header.py
+# pytest -v  tests/test_header.py
+# pytest -v --capture=no  tests/test_header.py::TestHeader::<METHODNAME>
+###############################################################
+
+import os
+
+import pytest
+from yamldb.YamlDB import YamlDB
+
+from cloudmesh.common.util import HEADING
+from cloudmesh.common.util import writefile
+from cloudmesh.common.systeminfo import os_is_windows
+from cloudmesh.common.util import path_expand
+
+if os_is_windows:
+    filename = "~/.cloudmesh/header.yaml"
+else:
+    filename = "/tmp/header.yaml"
+
+filename = path_expand(filename)
+
+
+def create(content):
+    for name in [filename, f"{filename}.wal"]:
+        if os.path.exists(name):
+            os.remove(name)
+    writefile(filename, content)
+
+
+@pytest.mark.incremental
+class TestHeader:
+
+    def test_document_start(self):
+        HEADING()
+        # the rest of the file is not valid yaml, so only the header is parsed
+        create("---\nversion: 2\nname: test\nid: x\ndata: [1, 2\n")
+        header = YamlDB.load_header(filename)
+        assert header == {"version": 2, "name": "test", "id": "x"}
+
+    def test_block_scalar(self):
+        HEADING()
+        create("name: |\n  first line\n\n  second line\nversion: 3\n"
+               "data: [1, 2\n")
+        header = YamlDB.load_header(filename, keys=("name", "version"))
+        assert header == {"name": "first line\n\nsecond line\n", "version": 3}
+
+    def test_key_later_in_file(self):
+        HEADING()
+        create("data:\n  a: 1\nversion: 4\n")
+        header = YamlDB.load_header(filename, keys=("version",))
+        assert header == {"version": 4}
+
+    def test_missing_key(self):
+        HEADING()
+        create("version: 5\ndata:\n  a: 1\n")
+        header = YamlDB.load_header(filename, keys=("version", "id"))
+        assert header == {"version": 5}
+
+    def test_wal(self):
+        HEADING()
+        create("version: 6\ndata:\n  a: 1\n")
+        db = YamlDB(filename=filename)
+        db["version"] = 7
+        assert os.path.isfile(f"{filename}.wal")
+        header = YamlDB.load_header(filename, keys=("version",))
+        assert header == {"version": 7}
+
+    def test_no_file(self):
+        HEADING()
+        os.remove(filename)
+        assert YamlDB.load_header(filename) == {}
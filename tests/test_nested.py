@@ -0,0 +1,78 @@
+###############################################################
+# pytest -v --capture=no tests/test_nested.py
+# pytest -v  tests/test_nested.py
+# pytest -v --capture=no  tests/test_nested.py::TestNested::<METHODNAME>
+###############################################################
+
+import os
+
+import pytest
+from yamldb.YamlDB import YamlDB
+
+from cloudmesh.common.util import HEADING
+from cloudmesh.common.systeminfo import os_is_windows
+from cloudmesh.common.util import path_expand
+
+if os_is_windows:
+    filename = "~/.cloudmesh/nested.yaml"
+else:
+    filename = "/tmp/nested.yaml"
+
+filename = path_expand(filename)
+
+
+@pytest.mark.incremental
+class TestNested:
+
+    def test_empty_parent(self):
+        HEADING()
+        db = YamlDB(data={"a": {"b": {"c": 1}}}, filename=filename)
+        db.delete("a.b.c")
+        assert db["a.b"] == {}
+        assert "a.b" in db
+        assert db.keys() == ["a.b"]
+
+        db["a.b.d"] = 2
+        assert db["a.b.d"] == 2
+        assert db["a.b"] == {"d": 2}
+        assert db.keys() == ["a.b.d"]
+
+    def test_replace_subtree(self):
+        HEADING()
+        db = YamlDB(data={"a": {"b": {"c": 1, "d": 2}}}, filename=filename)
+        db["a.b"] = 3
+        assert db["a.b"] == 3
+        assert "a.b.c" not in db
+        with pytest.raises(TypeError):
+            db["a.b.c"]
+
+        db["a"] = {"x": {"y": 4}}
+        assert db["a.x.y"] == 4
+        assert "a.b" not in db
+        with pytest.raises(KeyError):
+            db["a.b"]
+
+    def test_direct_changes(self):
+        HEADING()
+        db = YamlDB(data={"a": {"b": 1}}, filename=filename)
+        assert db["a.b"] == 1
+        db.dict()["a"] = {"b": 2}
+        assert db["a.b"] == 2
+        del db.dict()["a"]
+        assert "a.b" not in db
+        with pytest.raises(KeyError):
+            db["a.b"]
+
+    def test_reload(self):
+        HEADING()
+        db = YamlDB(data={"a": {"b": 1}}, filename=filename)
+        assert db["a.b"] == 1
+        other = YamlDB(filename=filename)
+        other["a.b"] = 2
+        other["a.c"] = 3
+        db.load()
+        assert db["a.b"] == 2
+        assert db["a.c"] == 3
+        db.close()
+        assert not os.path.isfile(f"{filename}.wal")
+        assert YamlDB(filename=filename)["a.b"] == 2
@@ -10,21 +10,134 @@ db.search("[?name=='Gregor']")
 [{'name': 'Gregor', 'age': 111}]
 
 """
-# pylint: disable=C0103,W0107,W0702
+# pylint: disable=C0103,W0107
+import copy
+import functools
+import json
 import os
+import stat
+import tempfile
+import threading
 
 import jmespath
-import oyaml as yaml
-from collections.abc import MutableMapping
-from contextlib import suppress
-from cloudmesh.common import dotdict
+import yaml
+
+try:
+    from yaml import CSafeLoader as _Loader, CSafeDumper as _Dumper
+except ImportError:  # libyaml is not available
+    from yaml import SafeLoader as _Loader, SafeDumper as _Dumper
+
+# size in bytes of buffered log records at which they are written without
+# waiting for the commit delay
+WAL_BUFFER_LIMIT = 64 * 1024
+
+
+@functools.lru_cache(maxsize=32)
+# mtime_ns, size and inode are not used, they only key the cache
+def _parse_yaml(path, mtime_ns, size, inode):  # pylint: disable=unused-argument
+    """
+    Parses the yaml file. The result is cached on the path, modification
+    time, size and inode of the file, so a changed file is parsed again. The
+    returned dict is shared and must not be modified by the caller.
+    """
+    with open(path, 'rb') as dbfile:
+        return yaml.load(dbfile, Loader=_Loader) or dict()
+
+
+def _file_mode(filename):
+    """
+    Returns the permission bits of the file, or the bits a new file gets
+    from the current umask if it does not exist.
+    """
+    try:
+        return stat.S_IMODE(os.stat(filename).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+@functools.lru_cache(maxsize=4096)
+def _split_key(key):
+    """
+    Returns the . separated key as a tuple of its parts.
+    """
+    return tuple(key.split(".")) if "." in key else (key,)
+
+
+# number of dotted keys for which a getter is generated
+GETTER_LIMIT = 1024
+
+_getters = {}
+_seen = set()
+
+
+def _make_getter(key):
+    """
+    Returns a function that looks up the . separated key in a dict with
+    one subscript per part, e.g. for "a.b" it returns d['a']['b'].
+    """
+    lookup = "".join(f"[{part!r}]" for part in key.split("."))
+    namespace = {}
+    exec(f"def getter(d):\n    return d{lookup}\n", namespace)  # pylint: disable=exec-used
+    return namespace["getter"]
+
+
+def _lookup(data, key):
+    """
+    Looks up the . separated key in data. The first lookup of a key walks
+    its parts. Generating a getter is only worth it for keys that are
+    used again, so it is done on the second lookup, for at most
+    GETTER_LIMIT keys.
+    """
+    getter = _getters.get(key)
+    if getter is not None:
+        return getter(data)
+    if key in _seen and len(_getters) < GETTER_LIMIT:
+        getter = _getters[key] = _make_getter(key)
+        return getter(data)
+    if len(_seen) >= 4 * GETTER_LIMIT:
+        _seen.clear()
+    _seen.add(key)
+    for part in _split_key(key):
+        data = data[part]
+    return data
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_query(query):
+    """
+    Returns the compiled jmespath expression of the query.
+    """
+    return jmespath.compile(query)
+
+
+def _is_json(value):
+    """
+    Checks if the value comes back unchanged from a JSON round trip, which
+    is required to store it in the write ahead log.
+    """
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            if not all(isinstance(key, str) for key in value):
+                return False
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif value is not None and not isinstance(value, (str, int, float)):
+            return False
+    return True
+
 
 class YamlDB:
     """
     The YamlBD class uses a file based yaml file as its database backend.
     """
 
-    def __init__(self, *, data=None, filename="yamldb.yml", backend=":file:"):
+    def __init__(self, *, data=None, filename="yamldb.yml", backend=":file:",
+                 autocommit=True, wal_limit=1024 * 1024, commit_delay=0.0):
         """
         Initializes the database, if data is not None it is
         used to initialize the DB.
@@ -33,11 +146,32 @@ class YamlDB:
         :type data:
         :param filename:
         :type filename:
+        :param autocommit: if True every change is flushed to the file,
+                           otherwise changes are written on flush()
+        :type autocommit: bool
+        :param wal_limit: size in bytes of the write ahead log at which
+                          it is compacted into the yaml file
+        :type wal_limit: int
+        :param commit_delay: seconds to wait after a change before the log
+                             is synced, so that changes made in the meantime
+                             share one write and fsync. With 0 every
+                             autocommit change is synced immediately.
+        :type commit_delay: float
         """
         if backend not in [":file:", ":memory:"]:
             raise ValueError("backend must be :file: or :memory:")
         self.backend = backend
         self.filename = filename
+        self._autocommit = autocommit
+        self._dirty = False
+        self._batch = 0
+        self._wal_name = f"{filename}.wal"
+        self._wal_size = 0
+        self._wal_limit = wal_limit
+        self._wal_buf = bytearray()
+        self._commit_delay = commit_delay
+        self._timer = None
+        self._lock = threading.Lock()
 
         if os.path.exists(filename) and data is not None:
             self.data = data
@@ -56,13 +190,94 @@ class YamlDB:
             raise ValueError("Load failed")
 
 
+    def __enter__(self):
+        """
+        Defers writing the changes made inside the with block until the
+        block is left, at which point they are written to the log once.
+        """
+        self._batch += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._batch -= 1
+        if self._batch == 0 and self._dirty:
+            self._commit()
+
+    def _log(self, op, key, value=None):
+        """
+        Records a change for the write ahead log and marks the data as
+        changed. Values that can not be stored as JSON cause the next
+        commit to rewrite the yaml file instead.
+        """
+        if self.backend == ":file:" and self._wal_buf is not None:
+            if _is_json(value):
+                record = json.dumps([op, key, value]) + "\n"
+                with self._lock:
+                    if self._wal_buf is not None:
+                        self._wal_buf += record.encode()
+            else:
+                self._rewrite()
+        self._mark_dirty()
+
+    def _rewrite(self):
+        """
+        Makes the next commit rewrite the yaml file instead of appending
+        to the write ahead log.
+        """
+        with self._lock:
+            self._wal_buf = None
+
+    def _replay(self):
+        """
+        Applies the changes recorded in the write ahead log to the data.
+        An incomplete last record, left by a crash, is ignored, as are
+        records that no longer apply because another instance changed
+        the same keys.
+        """
+        try:
+            wal = open(self._wal_name, "rb")
+        except FileNotFoundError:
+            return
+        with wal:
+            for line in wal:
+                try:
+                    op, key, value = json.loads(line)
+                except ValueError:
+                    break
+                try:
+                    if op == "set":
+                        self._set(key, value)
+                    elif op == "delete":
+                        self._delete(key)
+                except (KeyError, TypeError, ValueError):
+                    pass
+
+    def _mark_dirty(self):
+        """
+        Records that the data was changed and commits it to the log if
+        autocommit is enabled.
+        """
+        self._dirty = True
+        if not self._autocommit or self._batch:
+            return
+        if (self._commit_delay and self._wal_buf is not None
+                and len(self._wal_buf) < WAL_BUFFER_LIMIT
+                and self._wal_size <= self._wal_limit):
+            if self._timer is None:
+                self._timer = threading.Timer(self._commit_delay, self._sync_wal)
+                self._timer.start()
+        else:
+            self._commit()
+
     def _create_dir(self, filename):
         directory = os.path.dirname(filename)
+        if not directory:
+            return
         try:
             if not os.path.isdir(directory):
                 os.makedirs(directory, exist_ok=True)
-        except:
-            raise ValueError(f"YAMLDB: could not create directory={directory}")
+        except OSError as e:
+            raise ValueError(f"YAMLDB: could not create directory={directory}") from e
 
     def print_dictionary(self, dic, indent=0):
         if len(dic) == 0:
@@ -74,21 +289,30 @@ class YamlDB:
             else:
                 print('\t' * (indent + 1) + str(type(value)))
 
-    def get_keys(self, d=None, keys_list=None, parent=""):
-        if keys_list is None:
-            keys_list = []
-            keys_list = list(self.data.keys())
-        if d is None:
-            d = dict(self.data)
-        for key, value in d.items():
-            if isinstance(d[key], dict):
-                self.get_keys(d[key], keys_list, parent=key)
-            else:
-                keys_list.append(f"{parent}.{key}")
-        return keys_list
+    def get_keys(self):
+        return self.keys()
 
     def keys(self):
-        return self.get_keys()
+        """
+        Returns the . separated keys of all leaves in the order in which
+        they appear in the data. An empty dict is treated as a leaf.
+
+        :return: list of keys
+        :rtype: list
+        """
+        keys_list = []
+        stack = [("", iter(self.data.items()))]
+        while stack:
+            prefix, items = stack[-1]
+            for key, value in items:
+                path = f"{prefix}{key}"
+                if isinstance(value, dict) and value:
+                    stack.append((f"{path}.", iter(value.items())))
+                    break
+                keys_list.append(path)
+            else:
+                stack.pop()
+        return keys_list
 
     def __iter__(self):
         """
@@ -108,12 +332,14 @@ class YamlDB:
         :return:
         :rtype:
         """
-        found = True
-        try:
-            self.__getitem__(key)
-        except:
-            found = False
-        return found
+        if not isinstance(key, str):
+            return key in self.data
+        location = self.data
+        for part in _split_key(key):
+            if not isinstance(location, dict) or part not in location:
+                return False
+            location = location[part]
+        return True
 
     def clear(self):
         """
@@ -121,26 +347,88 @@ class YamlDB:
 
         """
         self.data.clear()
-        self.flush()
+        self._rewrite()
+        self._mark_dirty()
 
     def load(self, filename=None):
         """
-        Loads the data from the specified filename
+        Loads the data from the specified filename. Reloading the file of
+        the DB discards the changes that were not committed yet.
 
         :param filename:
         :type filename:
         :return:
         :rtype:
         """
-        prefix = os.path.dirname(filename)
-        if not os.path.exists(prefix):
-            os.makedirs(prefix)
-
         name = filename or self.filename
 
-        if os.path.exists(name):
-            with open(name, 'rb') as dbfile:
-                self.data = yaml.safe_load(dbfile) or dict()
+        if name == self.filename:
+            self._cancel_timer()
+            with self._lock:
+                self._wal_buf = bytearray()
+            self._dirty = False
+
+        try:
+            st = os.stat(name)
+        except FileNotFoundError:
+            return
+        if st.st_size == 0:
+            self.data = {}
+        else:
+            data = _parse_yaml(os.path.abspath(name),
+                               st.st_mtime_ns, st.st_size, st.st_ino)
+            self.data = copy.deepcopy(data)
+        if name == self.filename:
+            self._replay()
+
+    @staticmethod
+    def load_header(filename, keys=("version", "name", "id"), limit=32):
+        """
+        Returns the given top level keys of the yaml file without parsing
+        the whole file. Only the lines before the first top level key that
+        is not in keys are parsed, at most limit lines. If that is not
+        enough to find all keys, or the file has a write ahead log, the
+        whole DB is loaded instead.
+
+        Usage:
+            header = YamlDB.load_header('db.yml', keys=('version',))
+
+        :param filename: the yaml file
+        :param keys: the top level keys to return
+        :param limit: the maximum number of lines to read
+        :return: dict with the keys that were found
+        """
+        if not os.path.exists(filename):
+            return {}
+        header = None
+        if not os.path.exists(f"{filename}.wal"):
+            lines = []
+            complete = True
+            with open(filename) as stream:
+                for number, line in enumerate(stream):
+                    if number == limit:
+                        complete = False
+                        break
+                    if line[:1] in ("", " ", "\t", "\n", "\r", "#"):
+                        lines.append(line)
+                        continue
+                    if line.startswith("---") and number == 0:
+                        continue
+                    if line.startswith(("-", "?", "{", "[", "...")):
+                        complete = False
+                        break
+                    key = line.split(":", 1)[0].strip().strip("'\"")
+                    if key not in keys:
+                        break
+                    lines.append(line)
+            if complete:
+                try:
+                    header = yaml.load("".join(lines), Loader=_Loader) or {}
+                except yaml.YAMLError:
+                    header = None
+        if not isinstance(header, dict) or not all(key in header for key in keys):
+            header = YamlDB(filename=filename).data
+        return {key: header[key] for key in keys if key in header}
 
     def update(self, filename=None):
         """
@@ -158,12 +446,13 @@ class YamlDB:
 
         if os.path.exists(filename):
             with open(filename, 'rb') as dbfile:
-                data = yaml.safe_load(dbfile) or dict()
+                data = yaml.load(dbfile, Loader=_Loader) or dict()
                 id = data["id"] or "unknown"
                 if id in ["unknown", "MISSING"]:
                     print(f"Error: id not found for {filename}")
                 d = {id: data}
                 self.data.update(d)
+                self._rewrite()
 
     def save(self, filename=None):
         """
@@ -175,24 +464,131 @@ class YamlDB:
         :rtype:
         """
         name = filename or self.filename
-        with open(name, "w") as stream:
-            yaml.dump(self.data, stream, default_flow_style=False)
+        if name != self.filename:
+            self._create_dir(name)
+        content = yaml.dump(self.data, Dumper=_Dumper,
+                            default_flow_style=False, sort_keys=False)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(name) or ".",
+                                   prefix=f".{os.path.basename(name)}.",
+                                   suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as stream:
+                stream.write(content)
+                stream.flush()
+                os.fsync(stream.fileno())
+            os.chmod(tmp, _file_mode(name))
+            os.replace(tmp, name)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self._sync_dir(name)
+        if name == self.filename:
+            self._cancel_timer()
+            with self._lock:
+                self._truncate_wal()
+                self._wal_buf = bytearray()
+            self._dirty = False
+
+    @staticmethod
+    def _sync_dir(filename):
+        """
+        Syncs the directory of the file so a rename into it survives a
+        crash. Not all platforms can open a directory, there it is skipped.
+        """
+        try:
+            fd = os.open(os.path.dirname(filename) or ".", os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def _truncate_wal(self):
+        self._wal_size = 0
+        try:
+            os.remove(self._wal_name)
+        except FileNotFoundError:
+            pass
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _sync_wal(self):
+        """
+        Writes the buffered log records with a single write and syncs
+        them to disk.
+        """
+        with self._lock:
+            self._timer = None
+            buf = self._wal_buf
+            if not buf:
+                return
+            fd = os.open(self._wal_name,
+                         os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                         _file_mode(self.filename))
+            try:
+                written = os.write(fd, buf)
+                while written < len(buf):
+                    written += os.write(fd, buf[written:])
+                os.fsync(fd)
+                self._wal_size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            buf.clear()
+
+    def _commit(self):
+        """
+        Appends the changes made since the last commit to the write ahead
+        log of the file specified when the DB was loaded and syncs it to
+        disk. The log is compacted into the yaml file once it grows
+        beyond wal_limit.
+        """
+        if self.backend != ":file:":
+            self._dirty = False
+            return
+        self._cancel_timer()
+        if self._wal_buf is None:
+            self.save()
+            return
+        self._sync_wal()
+        self._dirty = False
+        if self._wal_size > self._wal_limit:
+            self.compact()
 
     def flush(self):
         """
-        saves the data to the file specified when the DB was loaded.
+        saves the data to the file specified when the DB was loaded and
+        empties the write ahead log. This also writes changes made
+        directly to the dict returned by dict().
 
         :return:
         :rtype:
         """
         if self.backend == ":file:":
             self.save()
+        else:
+            self._dirty = False
+
+    def compact(self):
+        """
+        Writes the data into the yaml file and empties the write ahead log.
+        """
+        if self.backend == ":file:":
+            self.save()
 
     def close(self):
         """
-        Close the DB without flushing the current content
+        Close the DB and write its content into the yaml file
         """
-        self.flush()
+        self.compact()
 
     def dict(self):
         """
@@ -208,9 +604,19 @@ class YamlDB:
         Retruns the yaml of the data
 
         :return:
-        :rtype:
+        :rtype: str
         """
-        return str(self.data)
+        return yaml.dump(self.data, Dumper=_Dumper,
+                         default_flow_style=False, sort_keys=False, indent=2)
+
+    def to_json(self):
+        """
+        Retruns the data as compact JSON with sorted keys
+
+        :return:
+        :rtype: str
+        """
+        return json.dumps(self.data, sort_keys=True, separators=(",", ":"))
 
     def __len__(self):
         """
@@ -219,7 +625,24 @@ class YamlDB:
         :return:
         :rtype:
         """
-        len(self.data)
+        return len(self.data)
+
+    def deep_len(self):
+        """
+        return the number of leaves, which is the length of keys()
+
+        :return:
+        :rtype: int
+        """
+        count = 0
+        stack = [self.data]
+        while stack:
+            for value in stack.pop().values():
+                if isinstance(value, dict) and value:
+                    stack.append(value)
+                else:
+                    count += 1
+        return count
 
     def __setitem__(self, key, value):
         """
@@ -245,86 +668,75 @@ class YamlDB:
         :param key: A string representing the value's path in the config.
         :param value: value to be set.
         """
+        if isinstance(value, str):
+            lower = value.lower()
+            if lower == 'true':
+                value = True
+            elif lower == 'false':
+                value = False
+
+        self._set(key, value)
+        self._log("set", key, value)
+
+    def _set(self, key, value):
+        if "." not in key:
+            self.data[key] = value
+            return
+        *parents, leaf = _split_key(key)
+        location = self.data
         try:
-            if value.lower() in ['true', 'false']:
-                value = value.lower() == 'true'
-        except:
-            pass
-
-        try:
-            if "." in key:
-                keys = key.split(".")
-                #
-                # create parents
-                #
-                parents = keys[:-1]
-                location = self.data
-                for parent in parents:
-                    if parent not in location:
-                        location[parent] = {}
-                    location = location[parent]
-                #
-                # create entry
-                #
-                location[keys[-1]] = value
-            else:
-                self.data[key] = value
+            #
+            # create parents
+            #
+            for parent in parents:
+                location = location.setdefault(parent, {})
+            #
+            # create entry
+            #
+            location[leaf] = value
+        except (AttributeError, TypeError):
+            raise ValueError(f"The key '{key}' could not be set in the yaml file '{self.filename}', "
+                             "a parent is not a dict")
+
+    def update_many(self, entries):
+        """
+        Sets all the . separated keys of the dict entries to their values
+        and flushes the data only once.
 
-        except KeyError:
-            raise ValueError(f"The key '{key}' could not be found in the yaml file '{self.filename}'")
-        except Exception as e:
-            print(e)
-            raise ValueError("unknown error")
-
-        self.flush()
-
-    def _delete_keys_from_dict(self, data, keys):
-        # inspired from
-        # https://stackoverflow.com/questions/3405715/elegant-way-to-remove-fields-from-nested-dictionaries
-        for key in keys:
-            with suppress(KeyError):
-                print ("DELETE", key, keys)
-                del data[key]
-        for value in data.values():
-            if isinstance(value, MutableMapping):
-                self._delete_keys_from_dict(value, keys)
-        # found = dict(data)
-        # for key in keys:
-        #     with suppress(KeyError):
-        #         print ("DELETE", key, keys)
-        #         found = found[key]
-        #         k = key
-        #         input("LLL")
-        # if found:
-        #     del data[k]
+        Usage:
+            db.update_many({'a.b': 1, 'a.c': 2})
 
+        :param entries: dict of keys and values
+        :type entries: dict
+        """
+        with self:
+            for key, value in entries.items():
+                self.set(key, value)
 
     def delete(self, item):
         """
         Deletes an item from the dict. The key is . separated
-        use it as follows get("a.b.c")
+        use it as follows get("a.b.c"). Deleting a key that does not
+        exist does nothing.
         :param item:
         :type item:
         :return:
         """
         try:
-             if "." in item:
-                 keys = item.split(".")
-                 d = self.data
-                 for key in keys[:-1]:
-                     d = d[key]
-                     print ("K", key, d)
-                 delkey = keys[-1]
-                 del d[key]
-                 #self._delete_keys_from_dict(self.data, keys)
-             else:
-                 del self.data[item]
-                 return
-        except Exception as e:
-             print(e)
-             # raise ValueError("unknown error")
-
+            self._delete(item)
+        except KeyError:
+            return
+        self._log("delete", item)
 
+    def _delete(self, item):
+        if "." not in item:
+            del self.data[item]
+        else:
+            *parents, leaf = _split_key(item)
+            location = self.data
+            for parent in parents:
+                location = location[parent]
+            del location[leaf]
 
     def __delitem__(self, key):
         self.delete(key)
@@ -337,20 +749,13 @@ class YamlDB:
         :type item:
         :return:
         """
+        data = self.data
         try:
-            if "." in item:
-                keys = item.split(".")
-            else:
-                return self.data[item]
-            element = self.data[keys[0]]
-            for key in keys[1:]:
-                element = element[key]
+            if not isinstance(item, str) or "." not in item:
+                return data[item]
+            return _lookup(data, item)
         except KeyError:
             raise KeyError(f"The key '{item}' could not be found in the yaml file '{self.filename}'")
-        except Exception as e:
-            print(e)
-            raise ValueError("unknown error")
-        return element
 
     def get(self, key, default=None):
         """
@@ -383,7 +788,7 @@ class YamlDB:
         :param query:
         :return: dict with the result
         """
-        return jmespath.search(query, self.data)
+        return _compile_query(query).search(self.data)
 
     def __str__(self):
         """
@@ -395,4 +800,4 @@ class YamlDB:
         if self.data is None:
             return ""
 
-        return yaml.dump(self.data, default_flow_style=False, indent=2)
+        return self.yaml()